@@ -1,42 +1,139 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # Convert card images to PDF for printing in natural size (63x88 mm)
-# Requires: reportlab
+# Requires: reportlab, Pillow
 
 import os, re, argparse, math
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from PIL import Image
+from reportlab import rl_config
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
 from reportlab.lib.pagesizes import A4, LETTER, A3
 
 CARD_W_MM = 63.0
 CARD_H_MM = 88.0
+CARD_W = CARD_W_MM*mm  # in points
+CARD_H = CARD_H_MM*mm
 
 PAPERS = {
     "a4": A4,         # 210 x 297 mm
     "letter": LETTER, # 8.5x11 in
     "a3": A3,
 }
+# write image streams as raw binary instead of ASCII85 text (+25% size)
+rl_config.useA85 = 0
+
 # reportlab reads png/jpg; webp support depends on the system
 IMG_EXTS = {".png", ".jpg", ".jpeg", ".webp"}
 
+# compiled once: natural_key runs for every file name
+_PAPER_RE = re.compile(
+    r'^\s*(\d+(?:\.\d+)?)\s*x\s*(\d+(?:\.\d+)?)(mm|cm|in)?\s*$', re.IGNORECASE)
+_NUM_RE = re.compile(r'(\d+)')
+
 def natural_key(s):
     return [int(t) if t.isdigit() else t.lower()
-            for t in re.split(r'(\d+)', s)]
+            for t in _NUM_RE.split(s)]
 
 def list_images(folder, copies=1):
-    files = []
-    for name in sorted(os.listdir(folder), key=natural_key):
-        ext = os.path.splitext(name)[1].lower()
-        if ext in IMG_EXTS:
-            # Add multiple copies of each image
-            for _ in range(copies):
-                files.append(os.path.join(folder, name))
-    return files
+    # scandir yields names and full paths together (no extra stat calls);
+    # filter and decorate with the natural sort key in a single pass
+    with os.scandir(folder) as it:
+        entries = [(natural_key(e.name), e.path) for e in it
+                   if os.path.splitext(e.name)[1].lower() in IMG_EXTS
+                   and e.is_file()]
+    entries.sort()
+    # Add multiple copies of each image
+    return [path for _, path in entries for _ in range(copies)]
+
+def _verify(path):
+    # PNG: verify() checks every chunk CRC without decoding. It doesn't
+    # catch truncated JPEG/WEBP data, so decode those at a reduced size
+    # (draft makes that a 1/8 scale JPEG decode)
+    try:
+        with Image.open(path) as im:
+            if im.format == "PNG":
+                im.verify()
+            else:
+                im.draft("RGB", (im.width // 8, im.height // 8))
+                im.load()
+        return None
+    except Exception as e:
+        return str(e)
+
+def verify_images(paths):
+    # Drop unreadable/corrupt files up front (I/O-bound, so threads suffice)
+    unique = list(dict.fromkeys(paths))
+    with ThreadPoolExecutor() as ex:
+        errors = dict(zip(unique, ex.map(_verify, unique)))
+    for path in unique:
+        if errors[path]:
+            print(f"[WARN] Cannot load image: {path} ({errors[path]})")
+    return [p for p in paths if not errors[p]]
+
+def card_pixels(dpi):
+    # card size in pixels at the given print resolution
+    return (round(CARD_W_MM / 25.4 * dpi), round(CARD_H_MM / 25.4 * dpi))
+
+def pad_to_card(im, fill=(255, 255, 255)):
+    # Center odd-aspect images (some tokens, art crops) on a 63:88 canvas,
+    # so they can be drawn stretched to the card box without distortion
+    iw, ih = im.size
+    ratio = CARD_W_MM / CARD_H_MM
+    if abs(iw / ih / ratio - 1) < 0.01:
+        return im  # card-shaped; a <1% stretch is invisible
+    cw = max(iw, round(ih * ratio))
+    ch = max(ih, round(iw / ratio))
+    out = Image.new(im.mode, (cw, ch), fill)
+    out.paste(im, ((cw - iw) // 2, (ch - ih) // 2))
+    return out
+
+def prepare_image(path, target_px=(744, 1039), quality=92):
+    # Downscale to the print resolution and re-encode as JPEG, so the PDF
+    # carries only the pixels that will be printed. Returns the JPEG bytes.
+    with Image.open(path) as im:
+        im.draft("RGB", target_px)  # JPEG shrink-on-load
+        im = im.convert("RGB")
+        im.thumbnail(target_px, Image.LANCZOS)
+        im = pad_to_card(im)
+        buf = BytesIO()
+        im.save(buf, "JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+def _prepare_job(job):
+    # runs in a worker process; errors are returned, not raised, so one
+    # bad file doesn't abort the whole map
+    path, target_px, quality = job
+    try:
+        return prepare_image(path, target_px, quality), None
+    except Exception as e:
+        return None, str(e)
+
+def prepare_images(paths, target_px, quality=92, jobs=None):
+    # Decode + resample all images on every core (the CPU-bound part);
+    # returns {path: jpeg bytes or None if the image can't be read}
+    work = [(p, target_px, quality) for p in paths]
+    workers = min(jobs or os.cpu_count() or 1, len(work))
+    if workers <= 1:
+        results = list(map(_prepare_job, work))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(_prepare_job, work,
+                                  chunksize=max(1, len(work) // (4*workers))))
+    prepared = {}
+    for path, (data, err) in zip(paths, results):
+        if err:
+            print(f"[WARN] Cannot load image: {path} ({err})")
+        prepared[path] = data
+    return prepared
 
 def parse_custom_paper(spec: str):
     # format "WxHmm" i.e. "210x297mm" or "279x216mm"
-    m = re.match(r'^\s*(\d+(?:\.\d+)?)\s*x\s*(\d+(?:\.\d+)?)(mm|cm|in)?\s*$',
-                 spec, re.IGNORECASE)
+    m = _PAPER_RE.match(spec)
     if not m:
         raise ValueError(
             "Invalid paper format. Example: 210x297mm or 8.5x11in")
@@ -51,78 +148,66 @@ def parse_custom_paper(spec: str):
         return (w*25.4*mm, h*25.4*mm)
     raise ValueError("Unknown units (allowed: mm, cm, in)")
 
-def draw_crop_marks(c: canvas.Canvas, x, y, w, h, mark_len=5*mm,
-                    offset=0.3*mm):
-    # draw crop marks outside the card corners
-    c.setLineWidth(0.3)
-    # bottom left
-    c.line(x - offset - mark_len, y - offset, x - offset, y - offset)
-    c.line(x - offset, y - offset - mark_len, x - offset, y - offset)
-    # bottom right
-    c.line(x + w + offset, y - offset, x + w + offset + mark_len, y - offset)
-    c.line(x + w + offset, y - offset - mark_len, x + w + offset, y - offset)
-    # top left
-    c.line(x - offset - mark_len, y + h + offset, x - offset, y + h + offset)
-    c.line(x - offset, y + h + offset, x - offset, y + h + offset + mark_len)
-    # top right
-    c.line(x + w + offset, y + h + offset, x + w + offset + mark_len,
-           y + h + offset)
-    c.line(x + w + offset, y + h + offset, x + w + offset,
-           y + h + offset + mark_len)
+def crop_mark_segments(x, y, w, h, mark_len=5*mm, offset=0.3*mm):
+    # crop mark lines outside the card corners, as (x1, y1, x2, y2)
+    return [
+        # bottom left
+        (x - offset - mark_len, y - offset, x - offset, y - offset),
+        (x - offset, y - offset - mark_len, x - offset, y - offset),
+        # bottom right
+        (x + w + offset, y - offset, x + w + offset + mark_len, y - offset),
+        (x + w + offset, y - offset - mark_len, x + w + offset, y - offset),
+        # top left
+        (x - offset - mark_len, y + h + offset, x - offset, y + h + offset),
+        (x - offset, y + h + offset, x - offset, y + h + offset + mark_len),
+        # top right
+        (x + w + offset, y + h + offset, x + w + offset + mark_len,
+         y + h + offset),
+        (x + w + offset, y + h + offset, x + w + offset,
+         y + h + offset + mark_len),
+    ]
 
 def draw_black_borders(c: canvas.Canvas, rows, cols, x0, y0, w, h, dx, dy,
-                       gap_mm):
-    # Draw black rectangles in the gaps between cards and around outer edges
+                       gap_mm, drawn=None):
+    # Paint the whole grid plus a gap-wide frame black, with the card
+    # images drawn on top of it. Slots not in `drawn` (empty slots on the
+    # last page, images that failed to load) get cut out as holes so they
+    # stay white, still within one fill operator. The fill uses the nonzero rule
+    # (reportlab defaults to even-odd, where overlapping rects cancel out),
+    # so holes are wound the other way: a negative width reverses "re".
     c.setFillColor((0, 0, 0))  # black
-    
+    p = c.beginPath()
+
     gap = gap_mm * mm
-    
+
     # Calculate the total grid dimensions
     total_width = cols * dx - gap
     total_height = rows * dy - gap
-    
-    # Draw outer border rectangles (extending beyond the card grid)
-    border_extend = gap  # How far to extend the border
-    
-    # Top border
-    c.rect(x0 - border_extend, y0 + total_height, 
-           total_width + 2*border_extend, border_extend, fill=1, stroke=0)
-    
-    # Bottom border  
-    c.rect(x0 - border_extend, y0 - border_extend,
-           total_width + 2*border_extend, border_extend, fill=1, stroke=0)
-    
-    # Left border
-    c.rect(x0 - border_extend, y0 - border_extend,
-           border_extend, total_height + 2*border_extend, fill=1, stroke=0)
-    
-    # Right border
-    c.rect(x0 + total_width, y0 - border_extend,
-           border_extend, total_height + 2*border_extend, fill=1, stroke=0)
-    
-    # Horizontal gaps (between rows)
-    for row in range(rows - 1):
-        y_gap = y0 + (rows - 1 - row) * dy - gap
-        c.rect(x0, y_gap, total_width, gap, fill=1, stroke=0)
-    
-    # Vertical gaps (between columns)
-    for col in range(cols - 1):
-        x_gap = x0 + col * dx + w
-        c.rect(x_gap, y0, gap, total_height, fill=1, stroke=0)
 
+    p.rect(x0 - gap, y0 - gap, total_width + 2*gap, total_height + 2*gap)
+
+    for slot in range(rows * cols):
+        if drawn is not None and slot in drawn:
+            continue
+        row, col = divmod(slot, cols)
+        p.rect(x0 + col*dx + w, y0 + (rows-1-row)*dy, -w, h)
+
+    c.drawPath(p, fill=1, stroke=0, fillMode=canvas.FILL_NON_ZERO)
+
+@lru_cache(maxsize=8)
 def compute_grid(page_w, page_h, margin_mm, gap_mm, orientation="auto"):
-    # Returns (pw, ph, rows, cols, x0, y0) where all values are in points
+    # Returns (rows, cols, x0, y0, rotated); x0/y0 are in points, measured
+    # on the page as laid out (width/height swapped when rotated).
     # Try portrait and landscape and choose the one with more cards
-    # (if orientation="auto")
+    # (if orientation="auto"). Pure, so results are memoized.
+    gap = gap_mm*mm
+    margin = margin_mm*mm
+
     def attempt(pw, ph):
-        usable_w = pw - 2*margin_mm*mm
-        usable_h = ph - 2*margin_mm*mm
-        cols = max(1, int((usable_w + gap_mm*mm)
-                          // ((CARD_W_MM*mm) + gap_mm*mm)))
-        rows = max(1, int((usable_h + gap_mm*mm)
-                          // ((CARD_H_MM*mm) + gap_mm*mm)))
-        x0 = (pw - (cols*CARD_W_MM*mm + (cols-1)*gap_mm*mm)) / 2.0
-        y0 = (ph - (rows*CARD_H_MM*mm + (rows-1)*gap_mm*mm)) / 2.0
+        cols = max(1, int((pw - 2*margin + gap) // (CARD_W + gap)))
+        rows = max(1, int((ph - 2*margin + gap) // (CARD_H + gap)))
+        x0 = (pw - (cols*CARD_W + (cols-1)*gap)) / 2.0
+        y0 = (ph - (rows*CARD_H + (rows-1)*gap)) / 2.0
         return rows, cols, x0, y0
 
     if orientation == "portrait":
@@ -141,24 +226,67 @@ def compute_grid(page_w, page_h, margin_mm, gap_mm, orientation="auto"):
         return r1, c1, x1, y1, False # portrait
 
 def make_pdf(images, out_path, paper_size, margin_mm=5.0, gap_mm=3.0,
-             cropmarks=False, orientation="auto", black_borders=False):
+             cropmarks=False, orientation="auto", black_borders=False,
+             dpi=300, jpeg_quality=92, jobs=None):
     c = canvas.Canvas(out_path, pagesize=paper_size)
     pw, ph = paper_size
     rows, cols, x0, y0, rotated = compute_grid(pw, ph, margin_mm, gap_mm,
                                                orientation)
 
     if rotated:
-        # swap coordinate system: rotate page 90°
-        c.translate(0, ph)
-        c.rotate(90)
+        # landscape: the grid above is already for the swapped page
         pw, ph = ph, pw
-        rows, cols, x0, y0, _ = compute_grid(pw, ph, margin_mm, gap_mm,
-                                             "portrait")
+        c.setPageSize((pw, ph))
 
-    w = CARD_W_MM*mm
-    h = CARD_H_MM*mm
-    dx = w + gap_mm*mm
-    dy = h + gap_mm*mm
+    w = CARD_W
+    h = CARD_H
+    gap = gap_mm*mm
+    dx = w + gap
+    dy = h + gap
+
+    if dpi > 0:
+        prepared = prepare_images(list(dict.fromkeys(images)),
+                                  card_pixels(dpi), jpeg_quality, jobs)
+        sources = {p: data and BytesIO(data) for p, data in prepared.items()}
+    else:
+        # plain paths: reportlab names these by path and embeds JPEGs as-is,
+        # without decoding them just to hash the pixels
+        sources = {p: p for p in images}
+
+    # Register each unique image once, as a card-sized form XObject; every
+    # placement is then just "q <cm> /Form Do Q" in the page stream, with
+    # no per-placement image hashing. Repeated cards (copies, basic lands)
+    # share one embedded image. Prepared images are already 63:88, so are
+    # drawn straight into the box; originals (--dpi 0) get aspect fitting,
+    # on a white box so letterbox bars don't show the black-border fill.
+    forms = {}
+    for n, (img, src) in enumerate(sources.items()):
+        if src is None:
+            continue
+        c.beginForm(f"card{n}", 0, 0, w, h)
+        try:
+            if dpi <= 0 and black_borders:
+                c.setFillColor((1, 1, 1))
+                c.rect(0, 0, w, h, fill=1, stroke=0)
+            c.drawImage(src if isinstance(src, str) else ImageReader(src),
+                        0, 0, width=w, height=h,
+                        preserveAspectRatio=dpi <= 0, anchor='sw',
+                        mask='auto')
+            forms[img] = f"card{n}"
+        except Exception as e:
+            print(f"[WARN] Cannot load image: {img} ({e})")
+        finally:
+            c.endForm()
+
+    # Crop marks are the same on every page: compute the segments once
+    marks = []
+    if cropmarks:
+        marks = [seg
+                 for grid_row in range(rows)
+                 for grid_col in range(cols)
+                 for seg in crop_mark_segments(x0 + grid_col*dx,
+                                               y0 + (rows-1-grid_row)*dy,
+                                               w, h, offset=0*mm)]
 
     i = 0
     per_page = rows * cols
@@ -166,21 +294,17 @@ def make_pdf(images, out_path, paper_size, margin_mm=5.0, gap_mm=3.0,
         if i % per_page == 0:
             if i > 0:
                 c.showPage()
-                # reset the orientation on the new page
-                if rotated:
-                    c.translate(0, ph)
-                    c.rotate(90)
             # Draw black borders for gaps on each page
             if black_borders:
-                draw_black_borders(c, rows, cols, x0, y0, w, h, dx, dy, gap_mm)
+                drawn = {slot for slot, p in enumerate(images[i:i+per_page])
+                         if p in forms}
+                draw_black_borders(c, rows, cols, x0, y0, w, h, dx, dy, gap_mm,
+                                   drawn=drawn)
             
             # Draw crop marks for all grid positions on each page
             if cropmarks:
-                for grid_row in range(rows):
-                    for grid_col in range(cols):
-                        grid_x = x0 + grid_col*dx
-                        grid_y = y0 + (rows-1-grid_row)*dy
-                        draw_crop_marks(c, grid_x, grid_y, w, h, offset=0*mm)
+                c.setLineWidth(0.3)
+                c.lines(marks)
 
         slot = i % per_page
         row = slot // cols
@@ -188,18 +312,18 @@ def make_pdf(images, out_path, paper_size, margin_mm=5.0, gap_mm=3.0,
         x = x0 + col*dx
         y = y0 + (rows-1-row)*dy  # from bottom to top
 
-        # drawImage: preserveAspectRatio=True
-        # (Scryfall PNG has ratio ~63x88 so it fits)
-        try:
-            c.drawImage(img, x, y, width=w, height=h,
-                        preserveAspectRatio=True, anchor='sw')
-        except Exception as e:
-            print(f"[WARN] Cannot load image: {img} ({e})")
+        if img in forms:
+            c.saveState()
+            c.translate(x, y)
+            c.doForm(forms[img])
+            c.restoreState()
 
         i += 1
 
     c.save()
-    return rows, cols, per_page
+    # images actually drawn; ones that failed to load left blank slots
+    placed = [img for img in images if img in forms]
+    return rows, cols, per_page, placed
 
 def main():
     p = argparse.ArgumentParser(
@@ -220,6 +344,13 @@ def main():
                    help="Fill gaps with black color for easier cutting")
     p.add_argument("--orientation", choices=["auto", "portrait", "landscape"],
                    default="auto", help="Page orientation")
+    p.add_argument("--dpi", type=int, default=300,
+                   help=("Resample images to this print DPI and embed as "
+                         "JPEG (0 = embed originals)"))
+    p.add_argument("--jpeg-quality", type=int, default=92,
+                   help="JPEG quality for resampled images")
+    p.add_argument("--jobs", type=int, default=None,
+                   help="Processes for resampling (default: all CPUs)")
     args = p.parse_args()
 
     # Determine paper size
@@ -229,13 +360,12 @@ def main():
     else:
         paper_size = parse_custom_paper(args.paper)
 
-    imgs = list_images(args.input_folder, copies=args.copies)
+    imgs = verify_images(list_images(args.input_folder, copies=args.copies))
     if not imgs:
         raise SystemExit(
-            "No images in the folder (supported: .png .jpg/.jpeg).")
+            "No readable images in the folder (supported: .png .jpg/.jpeg).")
 
-    unique_cards = len(imgs) // args.copies
-    rows, cols, per_page = make_pdf(
+    rows, cols, per_page, placed = make_pdf(
         imgs,
         out_path=args.out,
         paper_size=paper_size,
@@ -244,10 +374,14 @@ def main():
         cropmarks=args.cropmarks,
         orientation=args.orientation,
         black_borders=args.black_borders,
+        dpi=args.dpi,
+        jpeg_quality=args.jpeg_quality,
+        jobs=args.jobs,
     )
 
-    total = len(imgs)
-    pages = math.ceil(total / per_page)
+    unique_cards = len(set(placed))
+    total = len(placed)
+    pages = math.ceil(len(imgs) / per_page)
     print((f"Done: {unique_cards} unique cards, {args.copies} "
            f"copies each = {total} total images → {args.out} | "
            f"{rows}*{cols} per page ({per_page}/page), {pages} pages."))
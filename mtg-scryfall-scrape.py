@@ -1,41 +1,161 @@
 #!/usr/bin/env python3
-import argparse, json, os, re, time, urllib.parse, urllib.request
+import argparse, gzip, http.client, json, os, re, shutil, threading, time
+import urllib.error, urllib.parse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 API = "https://api.scryfall.com/cards/search"
 UA  = "scryfall-stdlib/1.0 (personal use)"
+REDIRECTS = (301, 302, 303, 307, 308)
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME")
+                         or os.path.expanduser("~/.cache"), "mtg-scryfall")
+
+# characters not allowed in file names -> "_", whitespace runs -> " "
+_SLUG_TABLE = str.maketrans({ch: "_" for ch in '\\/:*?"<>|'})
+_WS_RE = re.compile(r"\s+")
+
+# kept-alive HTTPS connections, one per (thread, host)
+_local = threading.local()
+
+class RateLimiter:
+    # token bucket: at most `rate` requests per second, bursts up to `burst`
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= 1
+            pause = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        # sleep outside the lock; the debt is already booked in `tokens`
+        if pause:
+            time.sleep(pause)
 
 def slug(s: str) -> str:
-    s = re.sub(r'[\\/:*?"<>|]', "_", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return _WS_RE.sub(" ", s.translate(_SLUG_TABLE)).strip()
 
 def build_query(sets, include_tokens=True):
-    parts = []
-    for sc in sets:
-        sc = sc.lower()
-        parts.append(f"e:{sc}")
-        if include_tokens:
-            parts.append(f"e:t{sc}")
-    return " OR ".join(parts)
+    prefixes = ("e:", "e:t") if include_tokens else ("e:",)
+    return " OR ".join(f"{p}{sc.lower()}" for sc in sets for p in prefixes)
+
+def _connection(host: str) -> http.client.HTTPSConnection:
+    conns = _local.__dict__.setdefault("conns", {})
+    conn = conns.get(host)
+    if conn is None:
+        conn = conns[host] = http.client.HTTPSConnection(host, timeout=60)
+    return conn
+
+def _send(conn, target, headers):
+    try:
+        conn.request("GET", target, headers=headers)
+        return conn.getresponse()
+    except BaseException:
+        conn.close()
+        raise
+
+@contextmanager
+def http_get(url: str, headers: dict | None = None, max_redirects=5):
+    # GET over a reused connection; the response must be read to the end
+    headers = {"User-Agent": UA, **(headers or {})}
+    for _ in range(max_redirects + 1):
+        u = urllib.parse.urlsplit(url)
+        target = u.path + (f"?{u.query}" if u.query else "")
+        conn = _connection(u.netloc)
+        try:
+            resp = _send(conn, target, headers)
+        except (http.client.RemoteDisconnected, ConnectionResetError,
+                BrokenPipeError):
+            # the server closed the idle keep-alive connection; reconnect
+            resp = _send(conn, target, headers)
+        if resp.status in REDIRECTS:
+            resp.read()
+            url = urllib.parse.urljoin(url, resp.getheader("Location", ""))
+            continue
+        if resp.status >= 400:
+            resp.read()
+            raise urllib.error.HTTPError(url, resp.status, resp.reason,
+                                         resp.headers, None)
+        try:
+            yield resp
+        except BaseException:
+            # body was not consumed, so the connection can't be reused
+            conn.close()
+            raise
+        return
+    raise urllib.error.URLError(f"Too many redirects: {url}")
 
 def http_get_json(url: str, params: dict | None = None):
     if params:
         url = f"{url}?{urllib.parse.urlencode(params)}"
-    req = urllib.request.Request(url, headers={"User-Agent": UA})
-    with urllib.request.urlopen(req, timeout=30) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+    with http_get(url, {"Accept-Encoding": "gzip"}) as resp:
+        body = resp.read()
+        encoding = resp.getheader("Content-Encoding")
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    return json.loads(body.decode("utf-8"))
 
-def stream_to_file(url: str, path: str):
+def stream_to_file(url: str, path: str, headers: dict | None = None):
+    # Returns (status, ETag); on 304 Not Modified the existing file is kept
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    req = urllib.request.Request(url, headers={"User-Agent": UA})
-    with urllib.request.urlopen(req, timeout=60) as r, open(path, "wb") as f:
-        while True:
-            chunk = r.read(1 << 14)
-            if not chunk:
-                break
-            f.write(chunk)
-
-def fetch_all_cards(query: str, include_variations=True, delay=0.12):
+    with http_get(url, headers) as r:
+        if r.status == 304:
+            r.read()
+            return r.status, r.getheader("ETag")
+        tmp = path + ".part"
+        with open(tmp, "wb", buffering=1 << 20) as f:
+            shutil.copyfileobj(r, f, length=1 << 18)  # 256 KiB per read
+        os.replace(tmp, path)
+        return r.status, r.getheader("ETag")
+
+def link_or_copy(src: str, dst: str):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def cached_download(url: str, path: str, cache_path: str,
+                    limiter: RateLimiter | None = None):
+    # cache_path holds the image, cache_path + ".json" its source URL + ETag.
+    # Scryfall image URLs change when the image does, so an unchanged URL
+    # is a hit without any request; otherwise revalidate with the ETag.
+    # Returns True if the image came from the cache (no body downloaded).
+    meta_path = cache_path + ".json"
+    meta = {}
+    if os.path.exists(cache_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+    hit = meta.get("url") == url
+    if not hit:
+        if limiter:
+            limiter.wait()
+        etag = meta.get("etag")
+        status, new_etag = stream_to_file(
+            url, cache_path, {"If-None-Match": etag} if etag else None)
+        # a 304 may omit the ETag; keep the one we revalidated with
+        etag = new_etag or etag
+        hit = status == 304
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"url": url, "etag": etag}, f)
+    link_or_copy(cache_path, path)
+    return hit
+
+def fetch_all_cards(query: str, include_variations=True, delay=0.12,
+                    workers=3):
     params = {
         "order": "set",
         "q": query,
@@ -45,10 +165,30 @@ def fetch_all_cards(query: str, include_variations=True, delay=0.12):
     }
     data = http_get_json(API, params)
     out = data.get("data", [])
+    if not data.get("has_more") or not out:
+        return out
+    # The first page tells how many pages there are, so fetch the rest
+    # concurrently (in order) instead of following next_page one by one
+    pages = -(-data.get("total_cards", 0) // len(out))
+    limiter = RateLimiter(1 / delay if delay > 0 else 0)
+
+    def fetch_page(n):
+        limiter.wait()
+        try:
+            return http_get_json(API, {**params, "page": n})
+        except urllib.error.HTTPError as e:
+            if e.code in (404, 422):  # paged past the end
+                return {}
+            raise
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        for data in ex.map(fetch_page, range(2, pages + 1)):
+            out.extend(data.get("data", []))
+    # total_cards is approximate for some queries; finish any leftovers
     while data.get("has_more"):
+        time.sleep(delay)
         data = http_get_json(data["next_page"])
         out.extend(data.get("data", []))
-        time.sleep(delay)
     return out
 
 def pick_image(card, version: str):
@@ -92,6 +232,12 @@ def main():
                     help="TXT file or folder for images")
     ap.add_argument("--delay", type=float, default=0.12,
                     help="Delay between requests (s)")
+    ap.add_argument("--workers", type=int, default=8,
+                    help="Parallel image downloads (rate still set by --delay)")
+    ap.add_argument("--cache-dir", default=CACHE_DIR,
+                    help="Image cache folder, reused across runs")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="Always download, bypassing the image cache")
     args = ap.parse_args()
 
     q = build_query(args.sets, include_tokens=not args.no_tokens)
@@ -108,9 +254,10 @@ def main():
         print(f"Zapisano {len(lines)} redaka → {os.path.abspath(out_path)}")
         return
 
-    # Download images
+    # Collect (url, path, cache key, label) for every image first
     out_dir = args.out
-    total = 0
+    ext = ".png" if args.image_version == "png" else ".jpg"
+    tasks = []
     for c in cards:
         set_code = (c.get("set") or "").upper()
         num = c.get("collector_number") or "?"
@@ -118,28 +265,47 @@ def main():
         base = f"{num} - {slug(name)} ({set_code})"
         folder = os.path.join(out_dir, set_code)
         chosen = pick_image(c, args.image_version)
+        cid = c.get("id") or slug(base)
 
         if isinstance(chosen, str):
-            ext = ".png" if args.image_version == "png" else ".jpg"
-            path = os.path.join(folder, base + ext)
-            try:
-                stream_to_file(chosen, path); total += 1
-            except Exception as e:
-                print(f"[SKIP] {name} #{num} ({set_code}) -> {e}")
-            time.sleep(args.delay)
-
+            key = f"{cid}_front_{args.image_version}{ext}"
+            tasks.append((chosen, os.path.join(folder, base + ext), key,
+                          f"{name} #{num} ({set_code})"))
         elif isinstance(chosen, dict):
             for side, url in chosen.items():
-                ext = ".png" if args.image_version == "png" else ".jpg"
                 path = os.path.join(folder, base + f" - {side}" + ext)
-                try:
-                    stream_to_file(url, path); total += 1
-                except Exception as e:
-                    print(f"[SKIP] {name} #{num} ({set_code}) [{side}] -> {e}")
-                time.sleep(args.delay)
+                key = f"{cid}_{side}_{args.image_version}{ext}"
+                tasks.append((url, path, key,
+                              f"{name} #{num} ({set_code}) [{side}]"))
         else:
             print(f"[NOIMG] {name} #{num} ({set_code})")
-    print(f"Downloaded {total} images → {os.path.abspath(out_dir)}")
+
+    # Download images in parallel, throttled to one request per --delay
+    limiter = RateLimiter(1 / args.delay if args.delay > 0 else 0)
+
+    if not args.no_cache:
+        os.makedirs(args.cache_dir, exist_ok=True)
+
+    def download(url, path, key):
+        # True if the image was served from the cache
+        if args.no_cache:
+            limiter.wait()
+            stream_to_file(url, path)
+            return False
+        return cached_download(url, path, os.path.join(args.cache_dir, key),
+                               limiter)
+
+    total = cached = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        futures = {ex.submit(download, url, path, key): label
+                   for url, path, key, label in tasks}
+        for fut in as_completed(futures):
+            try:
+                cached += fut.result(); total += 1
+            except Exception as e:
+                print(f"[SKIP] {futures[fut]} -> {e}")
+    print(f"Downloaded {total - cached} images, {cached} from cache "
+          f"→ {os.path.abspath(out_dir)}")
 
 if __name__ == "__main__":
     main()